@@ -17,6 +17,11 @@ import json
 import time
 from search import choose_move
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
 # Per-tick decision budget (ms)
 TICK_BUDGET_MS = 40
 VALID_MOVES = {"UP", "DOWN", "LEFT", "RIGHT"}
@@ -38,32 +43,38 @@ def sanitize_move(move):
 def main():
     print("🧠 Heuristic Agent ready. Waiting for game state...", file=sys.stderr)
 
+    # Bound once: the loop below runs every tick
+    readline = sys.stdin.readline
+    write = sys.stdout.write
+    flush = sys.stdout.flush
+
     while True:
-        line = sys.stdin.readline()
+        line = readline()
         if not line:
             break  # end of game stream
-        line = line.strip()
-        if not line:
+        if line.isspace():
             continue
 
+        # Both parsers accept the trailing newline, so no strip() copy
         try:
-            state = json.loads(line)
-        except json.JSONDecodeError:
+            state = orjson.loads(line) if orjson else json.loads(line)
+        except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
             print("⚠️ Invalid JSON received — skipping.", file=sys.stderr)
             continue
 
-        # Optional decision deadline (not enforced)
-        _ = time.perf_counter() + (TICK_BUDGET_MS / 1000.0)
+        # Decision deadline, enforced by the search
+        deadline = time.perf_counter() + (TICK_BUDGET_MS / 1000.0)
 
         try:
-            move = choose_move(state)
+            move = choose_move(state, deadline)
         except Exception as e:
             print(f"⚠️ Exception in choose_move(): {e}", file=sys.stderr)
             move = "UP"
 
         move = sanitize_move(move)
-        print(move)
-        sys.stdout.flush()
+        write(move)
+        write("\n")
+        flush()
 
     print("🏁 Agent terminated.", file=sys.stderr)
 
@@ -6,8 +6,11 @@ Provides grid and movement utilities for the Case Closed arena.
 Compatible with heuristic.py and RL environments.
 """
 
-from typing import List, Tuple
 from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 # Arena size
 H, W = 18, 20
@@ -21,6 +24,38 @@ DELTAS = {
     "RIGHT": (0, 1),
 }
 
+# Plain-tuple views of DELTAS for hot loops (no dict lookup per neighbor)
+DELTA_TUPLE = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIR_DELTA_PAIRS = (("UP", -1, 0), ("DOWN", 1, 0), ("LEFT", 0, -1), ("RIGHT", 0, 1))
+
+# Packed cell values for the flat uint8 board
+EMPTY, WALL = 0, 1
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(H: int, W: int) -> np.ndarray:
+    """
+    (H*W, 4) int32 table of flat neighbor indices in DELTA_TUPLE order,
+    with -1 where the neighbor is off the board. Built once per board shape.
+    """
+    table = np.full((H * W, 4), -1, dtype=np.int32)
+    for r in range(H):
+        for c in range(W):
+            for k, (dr, dc) in enumerate(DELTA_TUPLE):
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < H and 0 <= nc < W:
+                    table[r * W + c, k] = nr * W + nc
+    return table
+
+
+@lru_cache(maxsize=None)
+def neighbor_lists(H: int, W: int) -> Tuple[Tuple[int, ...], ...]:
+    """`neighbor_table` as plain tuples, for pure-Python loops."""
+    return tuple(map(tuple, neighbor_table(H, W).tolist()))
+
+
+NEIGHBORS = neighbor_table(H, W)
+
 # ------------------------------------------------------------
 # Core utilities
 # ------------------------------------------------------------
@@ -32,55 +67,89 @@ def inb(r: int, c: int) -> bool:
 def neighbors(r: int, c: int) -> List[Tuple[int, int]]:
     """Return list of neighboring coordinates (4-connected)."""
     out = []
-    for d in DIRS:
-        dr, dc = DELTAS[d]
+    for dr, dc in DELTA_TUPLE:
         nr, nc = r + dr, c + dc
         if inb(nr, nc):
             out.append((nr, nc))
     return out
 
 
-def legal_moves(board: List[List[str]], pos: Tuple[int, int]) -> List[str]:
+def board_to_u8(board: List[List[str]]) -> np.ndarray:
     """
-    Return all legal directions from the given position,
+    Pack a list-of-lists board into a flat uint8 array of shape (H*W,),
+    with EMPTY (0) for open cells and WALL (1) for "X". Cell (r, c) lives
+    at index r*W + c.
+    """
+    # Join the one-char cells into bytes instead of building a "<U1" array
+    cells = np.frombuffer("".join(map("".join, board)).encode("ascii"), dtype=np.uint8)
+    return (cells == ord("X")).view(np.uint8)
+
+
+# ------------------------------------------------------------
+# Hash-keyed caches
+# ------------------------------------------------------------
+LEGAL_CACHE_MAX = 65536
+FLOOD_CACHE_MAX = 4096
+_LEGAL_CACHE: Dict[Tuple[int, Tuple[int, int]], Tuple[str, ...]] = {}
+_FLOOD_CACHE: Dict[Tuple[int, Tuple[int, int]], int] = {}
+
+
+def _cache_put(cache: dict, limit: int, key, value) -> None:
+    """Insert into a bounded cache; dicts keep insertion order, so drop the oldest quarter when full."""
+    if len(cache) >= limit:
+        for old in list(islice(cache, limit // 4)):
+            del cache[old]
+    cache[key] = value
+
+
+def legal_moves(board: np.ndarray, H: int, W: int, pos: Tuple[int, int],
+                board_hash: Optional[int] = None) -> Tuple[str, ...]:
+    """
+    Return all legal directions from the given position on a flat board,
     i.e., directions that do not crash into walls or go out of bounds.
+    With a `board_hash`, results are cached on (board_hash, pos).
     """
-    r, c = pos
-    moves = []
-    for d in DIRS:
-        dr, dc = DELTAS[d]
-        nr, nc = r + dr, c + dc
-        if inb(nr, nc) and board[nr][nc] == " ":
-            moves.append(d)
+    if board_hash is not None:
+        moves = _LEGAL_CACHE.get((board_hash, pos))
+        if moves is not None:
+            return moves
+
+    nbrs = neighbor_lists(H, W)[pos[0] * W + pos[1]]
+    moves = tuple(d for d, ni in zip(DIRS, nbrs) if ni >= 0 and board[ni] == EMPTY)
+    if board_hash is not None:
+        _cache_put(_LEGAL_CACHE, LEGAL_CACHE_MAX, (board_hash, pos), moves)
     return moves
 
 
 # ------------------------------------------------------------
 # Flood fill for space evaluation
 # ------------------------------------------------------------
-@lru_cache(maxsize=512)
-def flood_fill_area(board_tuple: Tuple[Tuple[str, ...], ...], start: Tuple[int, int]) -> int:
+def flood_fill_area(board: np.ndarray, H: int, W: int, start: Tuple[int, int], board_hash: int) -> int:
     """
-    Compute the number of reachable open cells from a position using DFS.
-    Cached for efficiency when evaluating many moves on the same board.
+    Compute the number of reachable open cells from a position on a flat board.
+    Cached on (board_hash, start), where `board_hash` is any hash that identifies
+    the board (e.g. the search's Zobrist hash), so hits cost one dict lookup.
     """
-    Hh, Ww = len(board_tuple), len(board_tuple[0])
-    if not inb(*start) or board_tuple[start[0]][start[1]] != " ":
+    key = (board_hash, start)
+    area = _FLOOD_CACHE.get(key)
+    if area is None:
+        area = _flood_fill(board, H, W, start)
+        _cache_put(_FLOOD_CACHE, FLOOD_CACHE_MAX, key, area)
+    return area
+
+
+def _flood_fill(board: np.ndarray, H: int, W: int, start: Tuple[int, int]) -> int:
+    sr, sc = start
+    if not (0 <= sr < H and 0 <= sc < W) or board[sr * W + sc] != EMPTY:
         return 0
 
-    seen = {start}
-    stack = [start]
+    nbrs = neighbor_lists(H, W)
+    seen = {sr * W + sc}
+    stack = [sr * W + sc]
     while stack:
-        r, c = stack.pop()
-        for d in DIRS:
-            dr, dc = DELTAS[d]
-            nr, nc = r + dr, c + dc
-            if (nr, nc) not in seen and inb(nr, nc) and board_tuple[nr][nc] == " ":
-                seen.add((nr, nc))
-                stack.append((nr, nc))
+        idx = stack.pop()
+        for ni in nbrs[idx]:
+            if ni >= 0 and ni not in seen and board[ni] == EMPTY:
+                seen.add(ni)
+                stack.append(ni)
     return len(seen)
-
-
-def to_tuple_board(board: List[List[str]]) -> Tuple[Tuple[str, ...], ...]:
-    """Convert board (list of lists) to an immutable tuple version for caching."""
-    return tuple(tuple(row) for row in board)
@@ -7,8 +7,10 @@ Standalone simulation for Case Closed.
 - Implements the game logic (GameBoard, Agent, Game, etc.)
 - Converts internal state into the JSON format expected by agent.py
 - Runs agent.py as a subprocess, sends state, reads chosen move
+  (or, with --in-process, calls search.choose_move directly)
 """
 
+import argparse
 import json
 import random
 import subprocess
@@ -18,6 +20,13 @@ from collections import deque
 from enum import Enum
 from typing import Optional
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
 # === CONSTANTS ===
 EMPTY = 0
 AGENT = 1
@@ -27,24 +36,21 @@ class GameBoard:
     def __init__(self, height: int = 18, width: int = 20):
         self.height = height
         self.width = width
-        self.grid = [[EMPTY for _ in range(width)] for _ in range(height)]
+        # Flat row-major grid: cell (x, y) lives at y * width + x
+        self.grid = np.zeros(height * width, dtype=np.uint8)
 
-    def _torus_check(self, position: tuple[int, int]) -> tuple[int, int]:
-        x, y = position
-        return (x % self.width, y % self.height)
-    
     def get_cell_state(self, position: tuple[int, int]) -> int:
-        x, y = self._torus_check(position)
-        return self.grid[y][x]
+        x, y = position
+        return self.grid[(y % self.height) * self.width + (x % self.width)]
 
     def set_cell_state(self, position: tuple[int, int], state: int):
-        x, y = self._torus_check(position)
-        self.grid[y][x] = state
+        x, y = position
+        self.grid[(y % self.height) * self.width + (x % self.width)] = state
 
     def __str__(self) -> str:
-        chars = {EMPTY: '.', AGENT: 'A'}
-        return "\n".join(" ".join(chars.get(self.grid[y][x], '?') for x in range(self.width))
-                         for y in range(self.height))
+        chars = np.frombuffer(b".A", dtype=np.uint8)
+        rows = np.take(chars, self.grid).reshape(self.height, self.width)
+        return "\n".join(" ".join(row.tobytes().decode()) for row in rows)
 
 # === DIRECTIONS ===
 class Direction(Enum):
@@ -64,6 +70,9 @@ class Agent:
         self.agent_id = agent_id
         second = (start_pos[0] + start_dir.value[0], start_pos[1] + start_dir.value[1])
         self.trail = deque([start_pos, second])
+        # O(1) membership and head lookups, kept in sync with `trail`
+        self.trail_set: set[tuple[int, int]] = {start_pos, second}
+        self.head = second
         self.direction = start_dir
         self.board = board
         self.alive = True
@@ -73,7 +82,7 @@ class Agent:
         self.board.set_cell_state(second, AGENT)
     
     def is_head(self, position: tuple[int, int]) -> bool:
-        return position == self.trail[-1]
+        return position == self.head
     
     def move(self, direction: Direction, other_agent: Optional['Agent'] = None, use_boost: bool = False) -> bool:
         if not self.alive:
@@ -89,17 +98,19 @@ class Agent:
             req_dx, req_dy = direction.value
             if (req_dx, req_dy) == (-cur_dx, -cur_dy):
                 continue
-            head = self.trail[-1]
+            head = self.head
             dx, dy = direction.value
-            new_head = (head[0] + dx, head[1] + dy)
-            new_head = self.board._torus_check(new_head)
-            cell_state = self.board.get_cell_state(new_head)
+            board = self.board
+            x, y = (head[0] + dx) % board.width, (head[1] + dy) % board.height
+            new_head = (x, y)
+            idx = y * board.width + x
+            cell_state = board.grid[idx]
             self.direction = direction
             if cell_state == AGENT:
-                if new_head in self.trail:
+                if new_head in self.trail_set:
                     self.alive = False
                     return False
-                if other_agent and other_agent.alive and new_head in other_agent.trail:
+                if other_agent and other_agent.alive and new_head in other_agent.trail_set:
                     if other_agent.is_head(new_head):
                         self.alive = False
                         other_agent.alive = False
@@ -108,8 +119,10 @@ class Agent:
                         self.alive = False
                         return False
             self.trail.append(new_head)
+            self.trail_set.add(new_head)
+            self.head = new_head
             self.length += 1
-            self.board.set_cell_state(new_head, AGENT)
+            board.grid[idx] = AGENT
         return True
 
 # === GAME ===
@@ -119,6 +132,9 @@ class Game:
         self.agent1 = Agent(agent_id=1, start_pos=(1, 2), start_dir=Direction.RIGHT, board=self.board)
         self.agent2 = Agent(agent_id=2, start_pos=(17, 15), start_dir=Direction.LEFT, board=self.board)
         self.turns = 0
+        # Agent-format board matrix, kept in sync incrementally by build_state()
+        self.state_board = [["." for _ in range(self.board.width)] for _ in range(self.board.height)]
+        self.state_synced = [0, 0]
     
     def step(self, dir1: Direction, dir2: Direction, boost1: bool = False, boost2: bool = False):
         if self.turns >= 200:
@@ -148,42 +164,68 @@ MOVE_MAP = {
 }
 
 def build_state(game: Game) -> dict:
-    """Convert internal game state to JSON format expected by agent.py"""
-    board_matrix = []
-    for y in range(game.board.height):
-        row = []
-        for x in range(game.board.width):
-            val = game.board.grid[y][x]
-            row.append("." if val == 0 else "X")
-        board_matrix.append(row)
-    you_pos = game.agent1.trail[-1]
+    """
+    Convert internal game state to JSON format expected by agent.py.
+    The board matrix is reused across ticks; only cells added to either
+    trail since the previous call are written.
+    """
+    board_matrix = game.state_board
+    for i, agent in enumerate((game.agent1, game.agent2)):
+        trail = agent.trail
+        for k in range(game.state_synced[i], len(trail)):
+            x, y = trail[k]
+            board_matrix[y][x] = "X"
+        game.state_synced[i] = len(trail)
+    you_pos = game.agent1.head
+    opp_pos = game.agent2.head
     return {
         "board": board_matrix,
         "you": [you_pos[1], you_pos[0]],  # [row, col]
+        "opponent": [opp_pos[1], opp_pos[0]],
         "turn": game.turns,
     }
 
 # === MAIN LOOP ===
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Case Closed simulation")
+    parser.add_argument("--in-process", action="store_true",
+                        help="call search.choose_move directly instead of running agent.py as a subprocess")
+    args = parser.parse_args(argv)
+
     print("🎮 Starting Case Closed Simulation")
     game = Game()
 
-    # Launch agent.py as subprocess
-    agent_proc = subprocess.Popen(
-        [sys.executable, "agent.py"],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+    agent_proc = None
+    if args.in_process:
+        from search import choose_move
+        from agent import sanitize_move
+    else:
+        # Launch agent.py as subprocess
+        agent_proc = subprocess.Popen(
+            [sys.executable, "agent.py"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
 
     result = None
     while True:
-        state_json = json.dumps(build_state(game))
-        agent_proc.stdin.write(state_json + "\n")
-        agent_proc.stdin.flush()
+        if agent_proc is None:
+            # Same failure handling as agent.main in subprocess mode
+            try:
+                move = choose_move(build_state(game))
+            except Exception as e:
+                print(f"⚠️ Exception in choose_move(): {e}", file=sys.stderr)
+                move = "UP"
+            move = sanitize_move(move)
+        else:
+            state = build_state(game)
+            state_json = orjson.dumps(state).decode() if orjson else json.dumps(state)
+            agent_proc.stdin.write(state_json + "\n")
+            agent_proc.stdin.flush()
+            move = agent_proc.stdout.readline().strip()
 
-        move = agent_proc.stdout.readline().strip()
         if move not in MOVE_MAP:
             print(f"⚠️ Invalid move from agent: {move}. Using RIGHT.")
             move_dir = Direction.RIGHT
@@ -202,9 +244,10 @@ def main():
 
         time.sleep(0.05)
 
-    agent_proc.stdin.close()
-    agent_proc.terminate()
-    agent_proc.wait(timeout=1)
+    if agent_proc is not None:
+        agent_proc.stdin.close()
+        agent_proc.terminate()
+        agent_proc.wait(timeout=1)
 
 if __name__ == "__main__":
     main()
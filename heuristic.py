@@ -5,10 +5,20 @@ heuristic.py
 Heuristic scoring system with optimized DFS + opponent threat estimation.
 """
 
-from board import inb, DELTAS, legal_moves
-from copy import deepcopy
+from board import DELTAS, EMPTY, WALL, H as ARENA_H, W as ARENA_W, NEIGHBORS, board_to_u8, legal_moves, neighbor_lists, neighbor_table
 from collections import deque
 
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional; the pure-Python paths below are used instead
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
 # === Tunable Weights ===
 W_CRASH_SELF = -1.0
 W_CRASH_OPP = +1.0
@@ -26,16 +36,16 @@ W_FATAL = -9999.0
 # Helper functions
 # ----------------------------------------------------------------------
 
-def simulate_move(board, pos, move):
+def simulate_move(board, H, W, pos, move):
     dr, dc = DELTAS[move]
     nr, nc = pos[0] + dr, pos[1] + dc
-    if not inb(nr, nc) or board[nr][nc] == "X":
+    if not (0 <= nr < H and 0 <= nc < W) or board[nr * W + nc] == WALL:
         return pos, True
     return (nr, nc), False
 
 
-def next_legal_moves(board, pos):
-    return len(legal_moves(board, pos))
+def next_legal_moves(board, H, W, pos, board_hash=None):
+    return len(legal_moves(board, H, W, pos, board_hash))
 
 
 def manhattan(a, b):
@@ -43,75 +53,160 @@ def manhattan(a, b):
 
 
 # === OPTIMIZED LONGEST PATH ===
-def longest_safe_path(board, start):
-    H, W = len(board), len(board[0])
-    memo = {}
-    stack = [(start, frozenset())]
+def longest_safe_path(board, H, W, start):
+    """
+    Depth of a DFS walk from `start` that expands each open cell once.
+    A cheap lower bound on the true longest simple path; `visited` is an
+    int bitmask keyed by r*W + c, so marking and testing are single big-int ops.
+    """
+    if HAVE_NUMBA:
+        return longest_safe_path_nb(board, neighbor_table(H, W), start[0] * W + start[1])
+
+    nbrs = neighbor_lists(H, W)
+    stack = [(start[0] * W + start[1], 0)]
+    visited = 0
     max_len = 0
 
     while stack:
-        pos, visited = stack.pop()
-        if pos in memo:
-            max_len = max(max_len, memo[pos] + len(visited))
+        idx, depth = stack.pop()
+        bit = 1 << idx
+        if visited & bit:
             continue
+        visited |= bit
+        if depth > max_len:
+            max_len = depth
 
-        best_here = 0
-        r, c = pos
-        for dr, dc in DELTAS.values():
-            nr, nc = r + dr, c + dc
-            if not inb(nr, nc):
+        for ni in nbrs[idx]:
+            if ni < 0 or board[ni] == WALL or visited & (1 << ni):
                 continue
-            nxt = (nr, nc)
-            if board[nr][nc] == "X" or nxt in visited:
-                continue
-            stack.append((nxt, visited | {pos}))
-            best_here = max(best_here, 1)
-
-        memo[pos] = best_here
-        max_len = max(max_len, len(visited) + best_here)
+            stack.append((ni, depth + 1))
 
     return max_len
 
 
 # === NEW: Territory Threat Estimation ===
-def territorial_threat(board, you, opp, max_depth=6):
+def territorial_threat(board, H, W, you, opp, max_depth=6):
     """
-    Estimate how much of your reachable area is shared or threatened by opponent.
-    Lower is better (less overlap).
+    Estimate how much of the local territory the opponent claims first.
+    A single multi-source BFS (radius `max_depth` per head) assigns each cell
+    to whichever head reaches it first, ties going to the opponent; the result
+    is the opponent's share of all claimed cells. Lower is better.
     """
-    H, W = len(board), len(board[0])
-    dist_you = [[None]*W for _ in range(H)]
-    dist_opp = [[None]*W for _ in range(H)]
-
-    def bfs(start, dist_map):
-        q = deque([(start, 0)])
-        dist_map[start[0]][start[1]] = 0
-        while q:
-            (r, c), d = q.popleft()
-            if d >= max_depth:  # limit radius
+    you_idx = you[0] * W + you[1]
+    opp_idx = opp[0] * W + opp[1]
+    if HAVE_NUMBA:
+        return territorial_threat_nb(board, neighbor_table(H, W), you_idx, opp_idx, max_depth)
+
+    nbrs = neighbor_lists(H, W)
+    owner = np.full(H * W, -1, dtype=np.int8)
+    # Seed the opponent first so it wins equal-distance cells
+    owner[opp_idx] = 1
+    q = deque([(opp_idx, 0, 1)])
+    if owner[you_idx] < 0:
+        owner[you_idx] = 0
+        q.append((you_idx, 0, 0))
+
+    while q:
+        idx, d, who = q.popleft()
+        if d >= max_depth:  # limit radius
+            continue
+        for ni in nbrs[idx]:
+            if ni < 0 or board[ni] == WALL: continue
+            if owner[ni] < 0:
+                owner[ni] = who
+                q.append((ni, d + 1, who))
+
+    total = int(np.count_nonzero(owner >= 0))
+    threat = int(np.count_nonzero(owner == 1))
+    return threat / total  # share of claimed cells the opponent reaches as fast or faster
+
+
+# ----------------------------------------------------------------------
+# Numba kernels (flat uint8 board + neighbor table, monomorphic int arguments)
+# ----------------------------------------------------------------------
+
+@njit(cache=True)
+def longest_safe_path_nb(board, nbrs, start):
+    """DFS from flat index `start` expanding each open cell once; returns the deepest step reached."""
+    n = board.size
+    visited = np.zeros(n, dtype=np.int32)
+    stack_idx = np.empty(4 * n + 1, dtype=np.int32)
+    stack_len = np.empty(4 * n + 1, dtype=np.int32)
+    stack_idx[0] = start
+    stack_len[0] = 0
+    top = 1
+    max_len = 0
+
+    while top > 0:
+        top -= 1
+        idx = stack_idx[top]
+        depth = stack_len[top]
+        if visited[idx]:
+            continue
+        visited[idx] = 1
+        if depth > max_len:
+            max_len = depth
+
+        for k in range(4):
+            ni = nbrs[idx, k]
+            if ni < 0 or board[ni] == 1 or visited[ni]:
                 continue
-            for dr, dc in DELTAS.values():
-                nr, nc = r + dr, c + dc
-                if not inb(nr, nc): continue
-                if board[nr][nc] == "X": continue
-                if dist_map[nr][nc] is None:
-                    dist_map[nr][nc] = d + 1
-                    q.append(((nr, nc), d + 1))
+            stack_idx[top] = ni
+            stack_len[top] = depth + 1
+            top += 1
 
-    bfs(you, dist_you)
-    bfs(opp, dist_opp)
+    return max_len
 
+
+@njit(cache=True)
+def territorial_threat_nb(board, nbrs, you_idx, opp_idx, max_depth):
+    """Same ratio as `territorial_threat`, with an int8 owner map (-1 = unclaimed)."""
+    n = board.size
+    owner = np.full(n, -1, dtype=np.int8)
+    depth = np.zeros(n, dtype=np.int16)
+    queue = np.empty(n, dtype=np.int32)
+
+    # Seed the opponent first so it wins equal-distance cells
+    owner[opp_idx] = 1
+    queue[0] = opp_idx
+    tail = 1
+    if owner[you_idx] < 0:
+        owner[you_idx] = 0
+        queue[1] = you_idx
+        tail = 2
+
+    head = 0
+    while head < tail:
+        idx = queue[head]
+        head += 1
+        d = depth[idx]
+        if d >= max_depth:  # limit radius
+            continue
+        who = owner[idx]
+        for k in range(4):
+            ni = nbrs[idx, k]
+            if ni < 0 or board[ni] == 1 or owner[ni] >= 0:
+                continue
+            owner[ni] = who
+            depth[ni] = d + 1
+            queue[tail] = ni
+            tail += 1
+
+    # tail counts every claimed cell
     threat = 0
-    total = 0
-    for i in range(H):
-        for j in range(W):
-            if dist_you[i][j] is not None:
-                total += 1
-                if dist_opp[i][j] is not None and dist_opp[i][j] <= dist_you[i][j]:
-                    threat += 1
-    if total == 0:
-        return 0.0
-    return threat / total  # ratio of cells opponent can reach as fast or faster
+    for i in range(tail):
+        if owner[queue[i]] == 1:
+            threat += 1
+    return threat / tail
+
+
+if HAVE_NUMBA:
+    # Compile (or load from cache) at import with the same argument types as
+    # real calls, so the first tick doesn't pay for JIT inside its deadline.
+    _warm_board = np.zeros(ARENA_H * ARENA_W, dtype=np.uint8)
+    longest_safe_path_nb(_warm_board, NEIGHBORS, 0)
+    territorial_threat_nb(_warm_board, NEIGHBORS, 0, ARENA_H * ARENA_W - 1, 6)
+    del _warm_board
 
 
 # ----------------------------------------------------------------------
@@ -119,35 +214,96 @@ def territorial_threat(board, you, opp, max_depth=6):
 # ----------------------------------------------------------------------
 
 def heuristic_score(state, move):
-    board = deepcopy(state["board"])
-    you = tuple(state["you"])
-    opp = tuple(state["opponent"])
-    opp_dir = state.get("opponent_last_direction", "UP")
+    """One-off score of `move`; callers scoring several moves per tick should share a `precompute_tick` context."""
+    return score_move(precompute_tick(state), move)
+
+
+def _mark_heads(board, W, you, opp):
+    """Make: turn both heads into walls in place, returning what `_restore_heads` needs."""
+    you_idx = you[0] * W + you[1]
+    opp_idx = opp[0] * W + opp[1]
+    saved = (you_idx, board[you_idx], opp_idx, board[opp_idx])
+    board[you_idx] = WALL
+    board[opp_idx] = WALL
+    return saved
 
-    new_you, crash_you = simulate_move(board, you, move)
+
+def _restore_heads(board, saved):
+    """Unmake for `_mark_heads`."""
+    you_idx, old_you, opp_idx, old_opp = saved
+    board[opp_idx] = old_opp
+    board[you_idx] = old_you
+
+
+def precompute_tick(state):
+    """
+    Build the per-tick context shared by every candidate move.
+    The opponent does not move while our candidates are scored, so its
+    longest safe path and predicted next cell are computed once here, as is
+    the number of empty cells left once both heads are walls.
+    """
+    H, W = len(state["board"]), len(state["board"][0])
+    board = state.get("_board_u8")
+    if board is None:
+        board = board_to_u8(state["board"])
+    you = state.get("_you_t") or tuple(state["you"])
+    opp = state.get("_opp_t") or tuple(state["opponent"])
+    dr, dc = DELTAS.get(state.get("opponent_last_direction", "UP"), (0, 0))
+
+    saved = _mark_heads(board, W, you, opp)
+    try:
+        opp_path_len = longest_safe_path(board, H, W, opp)
+        empty_count = int(np.count_nonzero(board == EMPTY))
+    finally:
+        _restore_heads(board, saved)
+
+    return {
+        "board": board,
+        "H": H,
+        "W": W,
+        "you": you,
+        "opp": opp,
+        "predicted": (opp[0] + dr, opp[1] + dc),
+        "opp_path_len": opp_path_len,
+        "empty_count": empty_count,
+    }
+
+
+def score_move(ctx, move):
+    """Score `move` for us against a `precompute_tick` context; only our side is recomputed."""
+    board, H, W = ctx["board"], ctx["H"], ctx["W"]
+    you, opp = ctx["you"], ctx["opp"]
+
+    new_you, crash_you = simulate_move(board, H, W, you, move)
     if crash_you:
         return W_FATAL
 
-    board[you[0]][you[1]] = "X"
-    board[opp[0]][opp[1]] = "X"
+    # Make/unmake: mark both heads as walls on the shared board in place
+    # and restore them afterwards instead of copying the whole grid.
+    saved = _mark_heads(board, W, you, opp)
+    try:
+        return _score_marked(ctx, board, H, W, opp, new_you)
+    finally:
+        _restore_heads(board, saved)
 
-    if not inb(new_you[0], new_you[1]) or board[new_you[0]][new_you[1]] == "X":
+
+def _score_marked(ctx, board, H, W, opp, new_you):
+    """Score `new_you` on a flat board where both current heads are walls."""
+    new_cell = board[new_you[0] * W + new_you[1]]
+    if new_cell == WALL:
         return W_FATAL
 
     # Path advantage
-    my_path_len = longest_safe_path(board, new_you)
-    opp_path_len = longest_safe_path(board, opp)
-    path_diff = my_path_len - opp_path_len
+    my_path_len = longest_safe_path(board, H, W, new_you)
+    path_diff = my_path_len - ctx["opp_path_len"]
 
     # Threat estimation
-    threat_ratio = territorial_threat(board, new_you, opp)
+    threat_ratio = territorial_threat(board, H, W, new_you, opp)
 
     # Risk and positional awareness
     headon = (new_you == opp)
-    dr, dc = DELTAS.get(opp_dir, (0, 0))
-    predicted = (opp[0] + dr, opp[1] + dc)
-    risk = (new_you == predicted)
-    endgame = all(cell == "X" for row in board for cell in row)
+    risk = (new_you == ctx["predicted"])
+    endgame = ctx["empty_count"] == 0
 
     # Score aggregation
     score = 0.0
@@ -157,13 +313,33 @@ def heuristic_score(state, move):
     score += W_RISK * risk
     score += W_TERRITORY_THREAT * threat_ratio  # 🧩 new penalty for shared territory
 
-    if board[new_you[0]][new_you[1]] == " ":
+    if new_cell == EMPTY:
         score += W_EXPLORATION
 
-    freedom = next_legal_moves(board, new_you)
+    freedom = next_legal_moves(board, H, W, new_you)
     score += W_FREEDOM * freedom
 
     if endgame:
         score += W_ENDGAME
 
     return score
+
+
+def evaluate_position(board, H, W, you, opp, board_hash=None, empty_count=None):
+    """
+    Static evaluation of a search leaf from `you`'s point of view.
+    Both heads are expected to already be walls on the flat board;
+    `board_hash` (if known) lets the legal-move lookup hit the cache, and
+    `empty_count` (if tracked by the caller) enables the endgame bonus.
+    """
+    path_diff = longest_safe_path(board, H, W, you) - longest_safe_path(board, H, W, opp)
+    threat_ratio = territorial_threat(board, H, W, you, opp)
+    freedom = next_legal_moves(board, H, W, you, board_hash)
+
+    score = W_SURVIVAL
+    score += W_PATH_DIFF * path_diff
+    score += W_TERRITORY_THREAT * threat_ratio
+    score += W_FREEDOM * freedom
+    if empty_count == 0:
+        score += W_ENDGAME
+    return score
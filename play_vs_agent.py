@@ -16,7 +16,7 @@ import time
 import random
 import numpy as np
 import os
-from heuristic import heuristic_score
+from heuristic import precompute_tick, score_move
 from board import H, W, DELTAS, inb
 
 MOVES = ["UP", "DOWN", "LEFT", "RIGHT"]
@@ -125,7 +125,8 @@ def main():
         if not valid_ai_moves:
             print("🏆 You win! AI is trapped.")
             break
-        ai_move = max(valid_ai_moves, key=lambda m: heuristic_score(state_ai, m))
+        ctx = precompute_tick(state_ai)
+        ai_move = max(valid_ai_moves, key=lambda m: score_move(ctx, m))
         new_ai, crash_ai = move_player(board, ai, ai_move)
 
         # --- Collision checks ---
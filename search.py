@@ -3,35 +3,252 @@
 search.py
 ----------
 Move-selection logic for Case Closed heuristic agent.
-Evaluates each valid move using `heuristic_score()` and returns the best one.
+Seeds move ordering with the one-ply `score_move()`, then runs
+alpha-beta minimax with iterative deepening until the tick deadline.
 """
 
 import random
+import time
+from collections import OrderedDict
+
 import numpy as np
-from heuristic import heuristic_score
-from board import DELTAS, inb, H, W
+from heuristic import precompute_tick, score_move, evaluate_position, W_FATAL
+from board import DELTAS, EMPTY, WALL, board_to_u8, legal_moves, H as ARENA_H, W as ARENA_W
 
 MOVES = ["UP", "DOWN", "LEFT", "RIGHT"]
 
-def is_valid_move(board, pos, move):
-    """Check if a move stays in bounds and avoids walls."""
+# Search limits
+MAX_DEPTH = 7
+DEFAULT_BUDGET_MS = 40
+INF = float("inf")
+
+# Zobrist keys: one per (cell, EMPTY/WALL), one per head cell for each
+# side, and one for the side to move. Kept as Python ints for fast XOR.
+_zob_rng = np.random.default_rng(0xC10)
+ZOB_NP = _zob_rng.integers(0, 2**63, size=(ARENA_H * ARENA_W, 2), dtype=np.uint64)
+ZOB = ZOB_NP.tolist()
+ZOB_POS = {
+    "you": _zob_rng.integers(0, 2**63, size=ARENA_H * ARENA_W, dtype=np.uint64).tolist(),
+    "opp": _zob_rng.integers(0, 2**63, size=ARENA_H * ARENA_W, dtype=np.uint64).tolist(),
+}
+ZOB_SIDE = int(_zob_rng.integers(0, 2**63, dtype=np.uint64))
+
+# Transposition table: hash -> (depth, flag, value, best_move), LRU-capped
+EXACT, LOWER, UPPER = 0, 1, 2
+TT_MAX_ENTRIES = 1_000_000
+TT = OrderedDict()
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search once the tick deadline has passed."""
+
+
+def is_valid_move(board, H, W, pos, move):
+    """Check if a move stays in bounds and avoids walls on the flat board."""
     dr, dc = DELTAS[move]
     nr, nc = pos[0] + dr, pos[1] + dc
-    return inb(nr, nc) and board[nr][nc] != "X"
+    return 0 <= nr < H and 0 <= nc < W and board[nr * W + nc] != WALL
+
+
+def board_zobrist(board):
+    """Zobrist hash of the cells of a flat board alone."""
+    return int(np.bitwise_xor.reduce(ZOB_NP[np.arange(board.size), board]))
+
+
+def zobrist_hash(board_hash, W, you, opp):
+    """Full search key: board hash plus both heads, with us to move."""
+    return board_hash ^ ZOB_POS["you"][you[0] * W + you[1]] ^ ZOB_POS["opp"][opp[0] * W + opp[1]]
+
+
+# ------------------------------------------------------------
+# Make / unmake on the shared search node
+# ------------------------------------------------------------
+def make_move(node, side, move):
+    """
+    Step `side` ("you" or "opp") one cell in `move`, turning the new head
+    into a wall and updating both hashes and the empty-cell count
+    incrementally. Returns the previous head for `unmake_move`.
+    """
+    W = node["W"]
+    prev = node[side]
+    dr, dc = DELTAS[move]
+    nxt = (prev[0] + dr, prev[1] + dc)
+    idx = nxt[0] * W + nxt[1]
+    node["board"][idx] = WALL
+    node["empty_count"] -= 1
+    node[side] = nxt
+    pos_keys = ZOB_POS[side]
+    flip = ZOB[idx][EMPTY] ^ ZOB[idx][WALL]
+    node["board_hash"] ^= flip
+    node["hash"] ^= flip ^ pos_keys[prev[0] * W + prev[1]] ^ pos_keys[idx] ^ ZOB_SIDE
+    return prev
+
+
+def unmake_move(node, side, prev):
+    """Undo `make_move`: clear the current head of `side` and step back to `prev`."""
+    W = node["W"]
+    r, c = node[side]
+    idx = r * W + c
+    node["board"][idx] = EMPTY
+    node["empty_count"] += 1
+    node[side] = prev
+    pos_keys = ZOB_POS[side]
+    flip = ZOB[idx][EMPTY] ^ ZOB[idx][WALL]
+    node["board_hash"] ^= flip
+    node["hash"] ^= flip ^ pos_keys[prev[0] * W + prev[1]] ^ pos_keys[idx] ^ ZOB_SIDE
+
+
+def tt_store(key, depth, flag, value, best_move):
+    TT[key] = (depth, flag, value, best_move)
+    TT.move_to_end(key)
+    if len(TT) > TT_MAX_ENTRIES:
+        TT.popitem(last=False)
+
+
+# ------------------------------------------------------------
+# Alpha-beta
+# ------------------------------------------------------------
+def alphabeta(node, depth, alpha, beta, maximizing, deadline):
+    """
+    Alpha-beta minimax over alternating moves (we move when `maximizing`).
+    `node` holds the flat board with both heads as walls and is mutated
+    in place with make/unmake, so it is unchanged on return. Results are
+    shared across the tree through the transposition table. Raises
+    `SearchTimeout` as soon as a node is entered past the deadline.
+    """
+    if time.perf_counter() >= deadline:
+        raise SearchTimeout
+    key = node["hash"]
+    alpha_orig, beta_orig = alpha, beta
+    tt_move = None
+    entry = TT.get(key)
+    if entry is not None:
+        TT.move_to_end(key)
+        tt_depth, flag, tt_value, tt_move = entry
+        if tt_depth >= depth:
+            if flag == EXACT:
+                return tt_value
+            if flag == LOWER:
+                alpha = max(alpha, tt_value)
+            else:
+                beta = min(beta, tt_value)
+            if alpha >= beta:
+                return tt_value
+
+    board, H, W, board_hash = node["board"], node["H"], node["W"], node["board_hash"]
+    if depth == 0:
+        value = evaluate_position(board, H, W, node["you"], node["opp"], board_hash, node["empty_count"])
+        tt_store(key, 0, EXACT, value, None)
+        return value
+
+    side = "you" if maximizing else "opp"
+    moves = legal_moves(board, H, W, node[side], board_hash)
+    if not moves:
+        # Trapped: prefer losing later and winning sooner.
+        return W_FATAL - depth if maximizing else -W_FATAL + depth
+    if tt_move in moves:
+        moves = (tt_move,) + tuple(m for m in moves if m != tt_move)
+
+    best_move = moves[0]
+    if maximizing:
+        value = -INF
+        for m in moves:
+            prev = make_move(node, side, m)
+            try:
+                score = alphabeta(node, depth - 1, alpha, beta, False, deadline)
+            finally:
+                unmake_move(node, side, prev)
+            if score > value:
+                value, best_move = score, m
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+    else:
+        value = INF
+        for m in moves:
+            prev = make_move(node, side, m)
+            try:
+                score = alphabeta(node, depth - 1, alpha, beta, True, deadline)
+            finally:
+                unmake_move(node, side, prev)
+            if score < value:
+                value, best_move = score, m
+            beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+    if value <= alpha_orig:
+        flag = UPPER
+    elif value >= beta_orig:
+        flag = LOWER
+    else:
+        flag = EXACT
+    tt_store(key, depth, flag, value, best_move)
+    return value
+
 
 def choose_move(state, deadline=None):
     """
-    Evaluate heuristic score for all valid moves and pick the best one.
-    Returns the move name (string).
+    Pick the best move for `state["you"]` before `deadline` (a
+    `time.perf_counter()` timestamp). Returns the best move of the deepest
+    fully completed search iteration, or the best one-ply move if none
+    completed in time.
     """
-    board = np.array(state["board"], dtype="<U1")
-    you = tuple(state["you"])
-    valid_moves = [m for m in MOVES if is_valid_move(board, you, m)]
+    if deadline is None:
+        deadline = time.perf_counter() + DEFAULT_BUDGET_MS / 1000.0
+
+    H, W = len(state["board"]), len(state["board"][0])
+    # Pack the board once per tick; precompute_tick picks it up from the state.
+    board = board_to_u8(state["board"])
+    state["_board_u8"] = board
+    # Head tuples are built once per tick and shared with precompute_tick too
+    you = state["_you_t"] = tuple(state["you"])
+    opp = state["_opp_t"] = tuple(state["opponent"])
+    valid_moves = [m for m in MOVES if is_valid_move(board, H, W, you, m)]
 
     if not valid_moves:
         return random.choice(MOVES)
 
-    # Score each valid move
-    scores = {m: heuristic_score(state, m) for m in valid_moves}
-    best_move = max(scores, key=scores.get)
+    # One-ply scores seed the root ordering and are the fallback answer;
+    # opponent-side work is shared across the candidates via the tick context
+    ctx = precompute_tick(state)
+    scores = {m: score_move(ctx, m) for m in valid_moves}
+    order = sorted(valid_moves, key=scores.get, reverse=True)
+    best_move = order[0]
+
+    you_idx = you[0] * W + you[1]
+    opp_idx = opp[0] * W + opp[1]
+    old_you, old_opp = board[you_idx], board[opp_idx]
+    board[you_idx] = WALL
+    board[opp_idx] = WALL
+    try:
+        legal = legal_moves(board, H, W, you)
+        order = [m for m in order if m in legal]
+        board_hash = board_zobrist(board)
+        node = {"board": board, "H": H, "W": W, "you": you, "opp": opp,
+                "board_hash": board_hash, "hash": zobrist_hash(board_hash, W, you, opp),
+                "empty_count": ctx["empty_count"]}
+
+        # Iterative deepening, principal variation first at the root
+        for depth in range(1, MAX_DEPTH + 1):
+            if not order:
+                break
+            iter_scores = {}
+            alpha = -INF
+            try:
+                for m in order:
+                    prev = make_move(node, "you", m)
+                    try:
+                        iter_scores[m] = alphabeta(node, depth - 1, alpha, INF, False, deadline)
+                    finally:
+                        unmake_move(node, "you", prev)
+                    alpha = max(alpha, iter_scores[m])
+            except SearchTimeout:
+                break  # this iteration was cut short; keep the previous answer
+            order.sort(key=iter_scores.get, reverse=True)
+            best_move = order[0]
+    finally:
+        board[opp_idx] = old_opp
+        board[you_idx] = old_you
+
     return best_move